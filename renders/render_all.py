@@ -0,0 +1,33 @@
+"""
+Render All — builds and renders every gallery scene in a single Blender process.
+Run: blender -b --factory-startup --python renders/render_all.py
+The CUDA/OptiX context, compiled kernels and denoiser stay loaded between scenes.
+"""
+import bpy
+import importlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+SCENES = [
+    "render_golden_spiral",
+    "render_glass_fractal",
+    "render_crystal_cave",
+    "render_infinite_mirrors",
+]
+
+t0 = time.time()
+for i, name in enumerate(SCENES):
+    if i > 0:
+        # Start the next scene from an empty file; preferences (and with them
+        # the GPU device setup) are kept
+        bpy.ops.wm.read_homefile(use_empty=True)
+    scene = importlib.import_module(name)
+    scene.build_scene()
+    scene.render()
+
+print("=" * 60)
+print(f"Rendered {len(SCENES)} scenes in {time.time()-t0:.1f}s")
+print("=" * 60)
@@ -0,0 +1,138 @@
+"""
+Helpers shared by the render scripts: scene building, GPU and render setup.
+The GPU is probed once per Blender process; later calls reuse the result.
+"""
+import bpy
+import bmesh
+import os
+import time
+
+
+def clear():
+    """Remove all objects and their data without going through bpy.ops."""
+    bpy.data.batch_remove([
+        *bpy.data.objects, *bpy.data.meshes, *bpy.data.materials,
+        *bpy.data.lights, *bpy.data.cameras, *bpy.data.collections,
+    ])
+
+
+def material_from_template(name, template_name, build_template):
+    """Copy a template material, building its node tree on first use."""
+    template = bpy.data.materials.get(template_name)
+    if template is None:
+        template = build_template(template_name)
+    mat = template.copy()
+    mat.name = name
+    return mat
+
+
+def add_object(name, data, location=(0, 0, 0)):
+    """Create an object for existing data and link it to the active collection."""
+    obj = bpy.data.objects.new(name, data)
+    obj.location = location
+    bpy.context.collection.objects.link(obj)
+    return obj
+
+
+def add_light(name, light_type, location, energy, color):
+    light = bpy.data.lights.new(name, light_type)
+    light.energy = energy
+    light.color = color
+    return add_object(name, light, location)
+
+
+def make_plane_mesh(name, size):
+    bm = bmesh.new()
+    bmesh.ops.create_grid(bm, x_segments=1, y_segments=1, size=size / 2)
+    mesh = bpy.data.meshes.new(name)
+    bm.to_mesh(mesh)
+    bm.free()
+    return mesh
+
+
+def make_cube_mesh(name, size):
+    bm = bmesh.new()
+    bmesh.ops.create_cube(bm, size=size)
+    mesh = bpy.data.meshes.new(name)
+    bm.to_mesh(mesh)
+    bm.free()
+    return mesh
+
+
+_device_type = None
+
+
+def setup_gpu(scene):
+    """Render `scene` on the GPU, preferring OptiX and falling back to CUDA.
+
+    Returns the compute device type in use.
+    """
+    global _device_type
+    prefs = bpy.context.preferences.addons['cycles'].preferences
+    if _device_type is None:
+        # Prefer OptiX (RT-core BVH traversal), fall back to CUDA
+        for device_type in ('OPTIX', 'CUDA'):
+            try:
+                prefs.compute_device_type = device_type
+            except TypeError:
+                continue  # backend not compiled into this build
+            if prefs.get_devices_for_type(device_type):
+                break
+        prefs.get_devices()
+        for d in prefs.devices:
+            d.use = d.type != 'CPU'
+        _device_type = prefs.compute_device_type
+    scene.cycles.device = 'GPU'
+    return _device_type
+
+
+def configure_render(scene, samples, adaptive_min_samples):
+    """Settings every gallery render shares: 1280x720 Cycles on the GPU,
+    adaptive sampling up to `samples`, OIDN denoising and 8-bit PNG output."""
+    scene.render.engine = 'CYCLES'
+    setup_gpu(scene)
+    # A single 2048 GPU tile covers the whole 1280x720 frame
+    scene.cycles.use_auto_tile = True
+    scene.cycles.tile_size = 2048
+    scene.render.threads_mode = 'AUTO'  # CPU-side sync and BVH build use every core
+    scene.cycles.samples = samples  # upper bound; adaptive sampling stops early
+    scene.cycles.use_adaptive_sampling = True
+    scene.cycles.adaptive_threshold = 0.01
+    scene.cycles.adaptive_min_samples = adaptive_min_samples
+
+    # Denoise once on the final frame with OIDN running on the GPU
+    scene.cycles.use_denoising = True
+    scene.cycles.denoiser = 'OPENIMAGEDENOISE'
+    scene.cycles.denoising_use_gpu = True
+    scene.cycles.denoising_input_passes = 'RGB_ALBEDO_NORMAL'
+    scene.cycles.denoising_prefilter = 'ACCURATE'
+    scene.cycles.use_preview_denoising = False
+
+    scene.render.resolution_x = 1280
+    scene.render.resolution_y = 720
+    scene.render.resolution_percentage = 100
+    scene.render.film_transparent = False
+    scene.render.image_settings.file_format = 'PNG'
+    scene.render.image_settings.color_depth = '8'
+
+
+def render_still(scene, output, description):
+    """Render to `output`, report timing and save the optional EXR."""
+    scene.render.filepath = output
+
+    print(f"Rendering {description}...")
+    t_render = time.time()
+    bpy.ops.render.render(write_still=True)
+    t_render = time.time() - t_render
+
+    print(f"Done in {t_render:.1f}s ({os.path.getsize(output):,} bytes)")
+    print(f"Output: {output}")
+
+    # Optional half-float EXR of the same render for grading/compositing
+    if os.environ.get("BLENDER_RENDER_EXR"):
+        exr_output = os.path.splitext(output)[0] + ".exr"
+        scene.render.image_settings.file_format = 'OPEN_EXR'
+        scene.render.image_settings.color_depth = '16'
+        scene.render.image_settings.exr_codec = 'DWAA'
+        bpy.data.images['Render Result'].save_render(exr_output, scene=scene)
+        print(f"EXR: {exr_output}")
@@ -3,22 +3,23 @@ Glass Sierpinski Tetrahedron — recursive fractal with caustics and colored gla
 Showcases: Glass BSDF, caustics, area lighting, depth of field, denoising.
 """
 import bpy
-import bmesh
 import math
+import numpy as np
 import time
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from render_common import (
+    clear, material_from_template, add_object, add_light, make_plane_mesh, make_cube_mesh,
+    configure_render, render_still,
+)
 
 OUTPUT = "/tmp/blender_renders/glass_fractal.png"
 os.makedirs(os.path.dirname(OUTPUT), exist_ok=True)
 
 
-def clear():
-    bpy.ops.object.select_all(action='SELECT')
-    bpy.ops.object.delete()
-
-
-def make_glass(name, color, ior=1.5, roughness=0.03):
-    """Glass + subtle emission mix for visible colored glass."""
+def build_glass_template(name):
     mat = bpy.data.materials.new(name)
     mat.use_nodes = True
     nodes = mat.node_tree.nodes
@@ -30,12 +31,7 @@ def make_glass(name, color, ior=1.5, roughness=0.03):
     mix.inputs['Fac'].default_value = 0.15  # mostly glass, slight glow
 
     glass = nodes.new('ShaderNodeBsdfGlass')
-    glass.inputs['Color'].default_value = (*color, 1)
-    glass.inputs['IOR'].default_value = ior
-    glass.inputs['Roughness'].default_value = roughness
-
     emit = nodes.new('ShaderNodeEmission')
-    emit.inputs['Color'].default_value = (*color, 1)
     emit.inputs['Strength'].default_value = 3.0
 
     links.new(glass.outputs[0], mix.inputs[1])
@@ -44,70 +40,111 @@ def make_glass(name, color, ior=1.5, roughness=0.03):
     return mat
 
 
+def make_glass(name, color, ior=1.5, roughness=0.03):
+    """Glass + subtle emission mix for visible colored glass."""
+    mat = material_from_template(name, "_Glass Template", build_glass_template)
+    nodes = mat.node_tree.nodes
+
+    glass = nodes['Glass BSDF']
+    glass.inputs['Color'].default_value = (*color, 1)
+    glass.inputs['IOR'].default_value = ior
+    glass.inputs['Roughness'].default_value = roughness
+
+    nodes['Emission'].inputs['Color'].default_value = (*color, 1)
+    return mat
+
+
 def make_principled(name, color, metallic=0.0, roughness=0.5, emission_color=None, emission_strength=0.0):
+    # use_nodes creates a Principled BSDF already wired to the output
     mat = bpy.data.materials.new(name)
     mat.use_nodes = True
-    nodes = mat.node_tree.nodes
-    links = mat.node_tree.links
-    nodes.clear()
-    out = nodes.new('ShaderNodeOutputMaterial')
-    bsdf = nodes.new('ShaderNodeBsdfPrincipled')
+    bsdf = mat.node_tree.nodes['Principled BSDF']
     bsdf.inputs['Base Color'].default_value = (*color, 1)
     bsdf.inputs['Metallic'].default_value = metallic
     bsdf.inputs['Roughness'].default_value = roughness
     if emission_color:
         bsdf.inputs['Emission Color'].default_value = (*emission_color, 1)
         bsdf.inputs['Emission Strength'].default_value = emission_strength
-    links.new(bsdf.outputs[0], out.inputs[0])
     return mat
 
 
-def tetrahedron_verts(center, size):
-    """Return 4 vertices of a regular tetrahedron."""
-    cx, cy, cz = center
-    s = size
-    # Regular tetrahedron vertices
-    return [
-        (cx, cy, cz + s * 0.612),
-        (cx + s * 0.5, cy - s * 0.289, cz - s * 0.204),
-        (cx - s * 0.5, cy - s * 0.289, cz - s * 0.204),
-        (cx, cy + s * 0.577, cz - s * 0.204),
-    ]
-
-
-def create_tetrahedron(center, size, mat):
-    """Create a single tetrahedron mesh object."""
-    verts = tetrahedron_verts(center, size)
-    faces = [(0, 1, 2), (0, 2, 3), (0, 3, 1), (1, 3, 2)]
-
-    mesh = bpy.data.meshes.new("Tet")
-    mesh.from_pydata(verts, [], faces)
-    mesh.update()
-
-    obj = bpy.data.objects.new("Tet", mesh)
-    bpy.context.collection.objects.link(obj)
-    obj.data.materials.append(mat)
+def mathutils_look_at(source, target):
+    """Calculate rotation to point from source toward target."""
+    dx = target[0] - source[0]
+    dy = target[1] - source[1]
+    dz = target[2] - source[2]
+    dist_xy = math.sqrt(dx*dx + dy*dy)
+    # Tilt away from straight down (-Z) by the angle to the target, then turn
+    # the tilted view direction (+Y) toward it
+    rot_x = math.atan2(dist_xy, -dz)
+    rot_z = math.atan2(dy, dx) - math.pi/2
+    return (rot_x, 0, rot_z)
+
+
+# Offsets from a tetrahedron's center to its 4 corners, per unit of size
+TET_OFFSETS = np.array([
+    (0.0, 0.0, 0.612),
+    (0.5, -0.289, -0.204),
+    (-0.5, -0.289, -0.204),
+    (0.0, 0.577, -0.204),
+], dtype=np.float64)
+
+
+# Triangles of a single tetrahedron, indexing its 4 corners
+TET_FACES = np.array([(0, 1, 2), (0, 2, 3), (0, 3, 1), (1, 3, 2)], dtype=np.int32)
+
+
+def create_tetrahedra(centers, size, materials, collection):
+    """Create every tetrahedron as part of one mesh object.
+
+    Vertices, triangles and per-face material indices are written with
+    foreach_set from preallocated arrays instead of one mesh per tetrahedron.
+    """
+    n = len(centers)
+    verts = (centers[:, None, :] + TET_OFFSETS[None, :, :] * size).reshape(-1, 3)
+    corners = (TET_FACES[None, :, :] + 4 * np.arange(n, dtype=np.int32)[:, None, None]).ravel()
+
+    mesh = bpy.data.meshes.new("Sierpinski")
+    mesh.vertices.add(n * 4)
+    mesh.vertices.foreach_set("co", verts.astype(np.float32).ravel())
+    mesh.loops.add(n * 4 * 3)
+    mesh.loops.foreach_set("vertex_index", corners)
+    mesh.polygons.add(n * 4)
+    mesh.polygons.foreach_set("loop_start", np.arange(0, n * 4 * 3, 3, dtype=np.int32))
+    # Cycle through the materials one tetrahedron at a time
+    mesh.polygons.foreach_set(
+        "material_index", np.repeat(np.arange(n, dtype=np.int32) % len(materials), 4)
+    )
+    mesh.update(calc_edges=True)
+    for mat in materials:
+        mesh.materials.append(mat)
+
+    obj = bpy.data.objects.new("Sierpinski", mesh)
+    collection.objects.link(obj)
 
     # Smooth shading
-    for face in obj.data.polygons:
-        face.use_smooth = True
+    mesh.polygons.foreach_set("use_smooth", np.ones(len(mesh.polygons), dtype=bool))
 
     return obj
 
 
-def sierpinski(center, size, depth, materials, objects):
-    """Recursively build a Sierpinski tetrahedron."""
-    if depth == 0:
-        mat = materials[len(objects) % len(materials)]
-        obj = create_tetrahedron(center, size, mat)
-        objects.append(obj)
-        return
+def sierpinski_centers(center, size, depth):
+    """Return (centers, leaf_size) for every leaf tetrahedron of a Sierpinski fractal.
+
+    Each level moves every center halfway toward its 4 corners in one
+    broadcast, so the (4**depth, 3) array is built without recursion.
+    """
+    centers = np.array([center], dtype=np.float64)
+    for _ in range(depth):
+        centers = (centers[:, None, :] + TET_OFFSETS[None, :, :] * (size / 2)).reshape(-1, 3)
+        size /= 2
+    return centers, size
 
-    verts = tetrahedron_verts(center, size)
-    half = size / 2.0
-    for v in verts:
-        mid = ((center[0] + v[0]) / 2, (center[1] + v[1]) / 2, (center[2] + v[2]) / 2)
-        sierpinski(mid, half, depth - 1, materials, objects)
+
+def sierpinski(center, size, depth, materials, collection):
+    """Build a Sierpinski tetrahedron as a single mesh object."""
+    centers, leaf_size = sierpinski_centers(center, size, depth)
+    return create_tetrahedra(centers, leaf_size, materials, collection), len(centers)
 
 
 def setup_world():
@@ -127,10 +164,8 @@ def setup_world():
 
 def add_bounded_fog(center, size, density=0.015, color=(0.7, 0.8, 1.0)):
     """Add a cube with volume scatter — fog only inside the bounded area."""
-    bpy.ops.mesh.primitive_cube_add(size=1, location=center)
-    fog = bpy.context.active_object
+    fog = add_object("FogVolume", make_cube_mesh("FogVolume", 1), center)
     fog.scale = size
-    fog.name = "FogVolume"
     fog.display_type = 'WIRE'
 
     mat = bpy.data.materials.new("BoundedFog")
@@ -150,104 +185,103 @@ def add_bounded_fog(center, size, density=0.015, color=(0.7, 0.8, 1.0)):
     return fog
 
 
-print("=" * 60)
-print("GLASS SIERPINSKI TETRAHEDRON")
-print("=" * 60)
-
-clear()
-t0 = time.time()
+def create_scene():
+    """Build geometry, materials, lights, camera and world from scratch."""
+    clear()
+    t0 = time.time()
 
-# Materials — different colored glass for each level
-materials = [
-    make_glass("Ruby Glass", (0.9, 0.1, 0.15), ior=1.52),
-    make_glass("Sapphire Glass", (0.1, 0.2, 0.9), ior=1.77),
-    make_glass("Emerald Glass", (0.05, 0.8, 0.2), ior=1.58),
-    make_glass("Amber Glass", (0.95, 0.7, 0.1), ior=1.54),
-]
-
-# Build fractal (depth 4 = 256 tetrahedra with emissive glass)
-objects = []
-sierpinski((0, 0, 0), 3.0, 4, materials, objects)
-print(f"Created {len(objects)} tetrahedra in {time.time()-t0:.1f}s")
-
-# Ground — dark reflective with subtle color
-bpy.ops.mesh.primitive_plane_add(size=30, location=(0, 0, -1.0))
-ground = bpy.context.active_object
-ground.data.materials.append(
-    make_principled("Dark Mirror", (0.02, 0.02, 0.04), metallic=1.0, roughness=0.02)
-)
+    # Materials — different colored glass for each level
+    materials = [
+        make_glass("Ruby Glass", (0.9, 0.1, 0.15), ior=1.52),
+        make_glass("Sapphire Glass", (0.1, 0.2, 0.9), ior=1.77),
+        make_glass("Emerald Glass", (0.05, 0.8, 0.2), ior=1.58),
+        make_glass("Amber Glass", (0.95, 0.7, 0.1), ior=1.54),
+    ]
 
-# Lighting — dramatic with strong backlight for glass refraction
-for pos, color, energy, size in [
-    ((5, -4, 6), (1.0, 0.95, 0.9), 1500, 2.0),     # Key warm white — very bright
-    ((-4, 5, 4), (0.15, 0.3, 1.0), 600, 1.5),      # Fill cool blue — punchy
-    ((0, -6, 1.5), (1.0, 0.15, 0.0), 500, 1.0),    # Rim warm orange — low and tight
-    ((0, 6, 6), (0.9, 0.85, 1.0), 1800, 2.5),      # Backlight — high angle to avoid ground reflection
-    ((-2, -2, 8), (0.8, 0.9, 1.0), 600, 2.0),      # Top fill — illuminates from above
-]:
-    bpy.ops.object.light_add(type='AREA', location=pos)
-    light = bpy.context.active_object
-    light.data.energy = energy
-    light.data.color = color
-    light.data.size = size
-    # Point at center
-    constraint = light.constraints.new('TRACK_TO')
-    empty = bpy.data.objects.get("Target")
-    if not empty:
-        bpy.ops.object.empty_add(location=(0, 0, 0.3))
-        empty = bpy.context.active_object
-        empty.name = "Target"
-    constraint.target = empty
-    constraint.track_axis = 'TRACK_NEGATIVE_Z'
-    constraint.up_axis = 'UP_Y'
-
-# Camera
-bpy.ops.object.camera_add(location=(4.5, -4.0, 3.5))
-cam = bpy.context.active_object
-bpy.context.scene.camera = cam
-constraint = cam.constraints.new('TRACK_TO')
-constraint.target = empty
-constraint.track_axis = 'TRACK_NEGATIVE_Z'
-constraint.up_axis = 'UP_Y'
-
-# Depth of field
-cam.data.dof.use_dof = True
-cam.data.dof.focus_object = empty
-cam.data.dof.aperture_fstop = 4.0
-
-setup_world()
-
-# Render settings
-scene = bpy.context.scene
-scene.render.engine = 'CYCLES'
-scene.cycles.device = 'GPU'
-scene.cycles.samples = 512
-scene.cycles.use_denoising = True
-scene.cycles.max_bounces = 20
-scene.cycles.glossy_bounces = 12
-scene.cycles.transmission_bounces = 16
-scene.cycles.use_light_tree = True
-scene.render.resolution_x = 1280
-scene.render.resolution_y = 720
-scene.render.resolution_percentage = 100
-scene.render.film_transparent = False
-scene.render.image_settings.file_format = 'PNG'
-scene.render.image_settings.color_depth = '16'
-
-# GPU setup
-prefs = bpy.context.preferences.addons['cycles'].preferences
-prefs.compute_device_type = 'CUDA'
-prefs.get_devices()
-for d in prefs.devices:
-    d.use = True
-
-scene.render.filepath = OUTPUT
-
-print(f"Rendering 1280x720 @ 512 samples...")
-t_render = time.time()
-bpy.ops.render.render(write_still=True)
-t_render = time.time() - t_render
-
-size = os.path.getsize(OUTPUT)
-print(f"Done in {t_render:.1f}s ({size:,} bytes)")
-print(f"Output: {OUTPUT}")
+    # Build fractal (depth 4 = 256 tetrahedra with emissive glass) in a collection
+    # that is only linked to the scene once it is complete
+    fractal_col = bpy.data.collections.new("Sierpinski")
+    fractal, num_tets = sierpinski((0, 0, 0), 3.0, 4, materials, fractal_col)
+    bpy.context.scene.collection.children.link(fractal_col)
+    print(f"Created {num_tets} tetrahedra in {time.time()-t0:.1f}s")
+
+    # Ground — dark reflective with subtle color
+    ground = add_object("Ground", make_plane_mesh("Ground", 30), (0, 0, -1.0))
+    ground.data.materials.append(
+        make_principled("Dark Mirror", (0.02, 0.02, 0.04), metallic=1.0, roughness=0.02)
+    )
+
+    # Everything points at a static target, so rotations are baked once instead
+    # of evaluating TRACK_TO constraints; the empty remains as the DOF focus
+    TARGET = (0, 0, 0.3)
+    empty = add_object("Target", None, TARGET)
+
+    # Lighting — dramatic with strong backlight for glass refraction
+    for pos, color, energy, size in [
+        ((5, -4, 6), (1.0, 0.95, 0.9), 1500, 2.0),     # Key warm white — very bright
+        ((-4, 5, 4), (0.15, 0.3, 1.0), 600, 1.5),      # Fill cool blue — punchy
+        ((0, -6, 1.5), (1.0, 0.15, 0.0), 500, 1.0),    # Rim warm orange — low and tight
+        ((0, 6, 6), (0.9, 0.85, 1.0), 1800, 2.5),      # Backlight — high angle to avoid ground reflection
+        ((-2, -2, 8), (0.8, 0.9, 1.0), 600, 2.0),      # Top fill — illuminates from above
+    ]:
+        light = add_light("Area", 'AREA', pos, energy, color)
+        light.data.size = size
+        # Point at center
+        light.rotation_euler = mathutils_look_at(pos, TARGET)
+
+    # Camera
+    cam = add_object("Camera", bpy.data.cameras.new("Camera"), (4.5, -4.0, 3.5))
+    bpy.context.scene.camera = cam
+    cam.rotation_euler = mathutils_look_at(cam.location, TARGET)
+
+    # Depth of field
+    cam.data.dof.use_dof = True
+    cam.data.dof.focus_object = empty
+    cam.data.dof.aperture_fstop = 4.0
+
+    setup_world()
+
+    # Evaluate the finished scene once
+    bpy.context.view_layer.update()
+
+
+# Built scenes are cached as .blend files and reused while newer than this
+# script and render_common.py, which builds part of the scene
+CACHE = "/tmp/blender_renders/glass_fractal_cache.blend"
+
+
+def build_scene():
+    """Load the scene from the cache, building and caching it when stale."""
+    print("=" * 60)
+    print("GLASS SIERPINSKI TETRAHEDRON")
+    print("=" * 60)
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    sources = (__file__, os.path.join(here, "render_common.py"))
+    if os.path.exists(CACHE) and os.path.getmtime(CACHE) > max(map(os.path.getmtime, sources)):
+        bpy.ops.wm.open_mainfile(filepath=CACHE)
+        print(f"Loaded cached scene from {CACHE}")
+    else:
+        create_scene()
+        bpy.ops.wm.save_as_mainfile(filepath=CACHE, copy=True)
+
+
+def render():
+    """Apply render settings, render to OUTPUT and report timing."""
+    scene = bpy.context.scene
+    configure_render(scene, samples=512, adaptive_min_samples=16)
+    # Bounce budget — caustics through the glass saturate well before 8
+    # transmission bounces, so deeper paths only add cost
+    scene.cycles.max_bounces = 12
+    scene.cycles.glossy_bounces = 4
+    scene.cycles.transmission_bounces = 8
+    scene.cycles.sample_clamp_indirect = 5.0
+    scene.cycles.caustics_reflective = False
+    scene.cycles.use_light_tree = True
+
+    render_still(scene, OUTPUT, "1280x720 @ 512 samples")
+
+
+if __name__ == "__main__":
+    build_scene()
+    render()
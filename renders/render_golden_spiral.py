@@ -4,39 +4,79 @@ Showcases: SSS materials, metallic shaders, HDRI-like lighting, motion blur, vol
 """
 import bpy
 import math
+import numpy as np
 import time
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from render_common import (
+    clear, material_from_template, add_object, add_light, make_plane_mesh,
+    configure_render, render_still,
+)
 
 OUTPUT = "/tmp/blender_renders/golden_spiral.png"
 os.makedirs(os.path.dirname(OUTPUT), exist_ok=True)
 
 
-def clear():
-    bpy.ops.object.select_all(action='SELECT')
-    bpy.ops.object.delete()
+def make_principled(name, color, metallic=0.0, roughness=0.5):
+    # use_nodes creates a Principled BSDF already wired to the output
+    mat = bpy.data.materials.new(name)
+    mat.use_nodes = True
+    bsdf = mat.node_tree.nodes['Principled BSDF']
+    bsdf.inputs['Base Color'].default_value = (*color, 1)
+    bsdf.inputs['Metallic'].default_value = metallic
+    bsdf.inputs['Roughness'].default_value = roughness
+    return mat
+
+
+def add_constant_ramp(nodes, values):
+    """Color ramp with one flat band per value over [0, 1)."""
+    ramp = nodes.new('ShaderNodeValToRGB')
+    ramp.color_ramp.interpolation = 'CONSTANT'
+    elements = ramp.color_ramp.elements
+    elements[1].position = 1 / len(values)
+    for i in range(2, len(values)):
+        elements.new(i / len(values))
+    for element, value in zip(elements, values):
+        element.color = (*value, 1)
+    return ramp
 
 
-def make_principled(name, color, metallic=0.0, roughness=0.5, subsurface=0.0, ss_radius=None):
+def make_variant_material(name, variants):
+    """One Principled material covering several looks, picked per object.
+
+    Each object's "variant" custom property in [0, 1) selects a band of the
+    ramps; variants are (base_color, metallic, roughness, subsurface).
+    """
     mat = bpy.data.materials.new(name)
     mat.use_nodes = True
     nodes = mat.node_tree.nodes
     links = mat.node_tree.links
-    nodes.clear()
-    out = nodes.new('ShaderNodeOutputMaterial')
-    bsdf = nodes.new('ShaderNodeBsdfPrincipled')
-    bsdf.inputs['Base Color'].default_value = (*color, 1)
-    bsdf.inputs['Metallic'].default_value = metallic
-    bsdf.inputs['Roughness'].default_value = roughness
-    if subsurface > 0:
-        bsdf.inputs['Subsurface Weight'].default_value = subsurface
-        bsdf.inputs['Subsurface Scale'].default_value = 0.1
-        if ss_radius:
-            bsdf.inputs['Subsurface Radius'].default_value = ss_radius
-    links.new(bsdf.outputs[0], out.inputs[0])
+    bsdf = nodes['Principled BSDF']  # default tree, already wired to the output
+    bsdf.inputs['Subsurface Scale'].default_value = 0.1
+    bsdf.inputs['Subsurface Radius'].default_value = (0.1, 0.8, 0.2)
+
+    attr = nodes.new('ShaderNodeAttribute')
+    attr.attribute_type = 'OBJECT'
+    attr.attribute_name = "variant"
+
+    color_ramp = add_constant_ramp(nodes, [v[0] for v in variants])
+    # Metallic, roughness and subsurface weight packed into R, G, B
+    param_ramp = add_constant_ramp(nodes, [v[1:] for v in variants])
+    params = nodes.new('ShaderNodeSeparateColor')
+
+    links.new(attr.outputs['Fac'], color_ramp.inputs['Fac'])
+    links.new(attr.outputs['Fac'], param_ramp.inputs['Fac'])
+    links.new(color_ramp.outputs['Color'], bsdf.inputs['Base Color'])
+    links.new(param_ramp.outputs['Color'], params.inputs['Color'])
+    links.new(params.outputs['Red'], bsdf.inputs['Metallic'])
+    links.new(params.outputs['Green'], bsdf.inputs['Roughness'])
+    links.new(params.outputs['Blue'], bsdf.inputs['Subsurface Weight'])
     return mat
 
 
-def make_emission(name, color, strength):
+def build_emission_template(name):
     mat = bpy.data.materials.new(name)
     mat.use_nodes = True
     nodes = mat.node_tree.nodes
@@ -44,153 +84,169 @@ def make_emission(name, color, strength):
     nodes.clear()
     out = nodes.new('ShaderNodeOutputMaterial')
     emit = nodes.new('ShaderNodeEmission')
+    links.new(emit.outputs[0], out.inputs[0])
+    return mat
+
+
+def make_emission(name, color, strength):
+    mat = material_from_template(name, "_Emission Template", build_emission_template)
+    emit = mat.node_tree.nodes['Emission']
     emit.inputs['Color'].default_value = (*color, 1)
     emit.inputs['Strength'].default_value = strength
-    links.new(emit.outputs[0], out.inputs[0])
     return mat
 
 
-print("=" * 60)
-print("GOLDEN FIBONACCI SPIRAL")
-print("=" * 60)
+def make_uv_sphere_mesh(name, segments=24, rings=16):
+    """Unit UV sphere built from numpy arrays, with smooth shading baked in."""
+    phi = np.pi * np.arange(1, rings) / rings
+    theta = 2 * np.pi * np.arange(segments) / segments
+    ring_verts = np.stack([
+        np.outer(np.sin(phi), np.cos(theta)),
+        np.outer(np.sin(phi), np.sin(theta)),
+        np.repeat(np.cos(phi)[:, None], segments, axis=1),
+    ], axis=-1).reshape(-1, 3)
+    # Top pole, (rings - 1) rings of segments vertices, bottom pole
+    verts = np.vstack([(0, 0, 1), ring_verts, (0, 0, -1)])
+
+    k = np.arange(segments)
+    k1 = (k + 1) % segments
+    first = 1 + np.arange(rings - 2)[:, None] * segments
+    last = 1 + (rings - 2) * segments
+    faces = (
+        np.stack([np.zeros_like(k), 1 + k, 1 + k1], axis=1).tolist()
+        + np.stack([first + k, first + segments + k, first + segments + k1, first + k1],
+                   axis=-1).reshape(-1, 4).tolist()
+        + np.stack([np.full_like(k, len(verts) - 1), last + k1, last + k], axis=1).tolist()
+    )
 
-clear()
-t0 = time.time()
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata(verts.tolist(), [], faces)
+    mesh.polygons.foreach_set("use_smooth", np.ones(len(faces), dtype=bool))
+    mesh.update()
+    return mesh
+
+
+def build_scene():
+    """Build geometry, materials, lights, camera and world from scratch."""
+    print("=" * 60)
+    print("GOLDEN FIBONACCI SPIRAL")
+    print("=" * 60)
+
+    clear()
+    t0 = time.time()
+
+    golden_angle = math.pi * (3 - math.sqrt(5))  # ~137.5 degrees
+
+    # Materials — gold, copper, bronze, SSS jade and rose gold in a single
+    # material so every sphere shares one shader
+    variants = [
+        ((0.95, 0.75, 0.15), 1.0, 0.08, 0.0),   # Gold
+        ((0.85, 0.45, 0.2), 1.0, 0.12, 0.0),    # Copper
+        ((0.7, 0.45, 0.2), 1.0, 0.15, 0.0),     # Bronze
+        ((0.15, 0.6, 0.3), 0.0, 0.2, 0.6),      # Jade
+        ((0.85, 0.5, 0.45), 1.0, 0.1, 0.0),     # Rose gold
+    ]
+    spiral_mat = make_variant_material("Spiral", variants)
+
+    # One unit sphere mesh shared by every sphere
+    sphere_mesh = make_uv_sphere_mesh("Sphere")
+    sphere_mesh.materials.append(spiral_mat)
+
+    # Create spiral of spheres
+    n_spheres = 300
+    idx = np.arange(n_spheres)
+    theta = idx * golden_angle
+    r = 0.15 * np.sqrt(idx)
+    # Size varies — larger in center, smaller outward
+    sizes = 0.08 + 0.06 * (1 - idx / n_spheres)
+    # z = size so every sphere sits on the ground plane
+    locations = np.stack([r * np.cos(theta), r * np.sin(theta), sizes], axis=1)
+
+    objects = []
+    for i, (location, sphere_size) in enumerate(zip(locations.tolist(), sizes.tolist())):
+        obj = add_object(f"Sphere{i}", sphere_mesh, location)
+        obj.scale = (sphere_size, sphere_size, sphere_size)
+        obj["variant"] = (i % len(variants) + 0.5) / len(variants)
+        objects.append(obj)
+
+    print(f"Created {len(objects)} spheres in {time.time()-t0:.1f}s")
+
+    # Small emissive accents tucked among the spheres (not floating white blobs)
+    orb_colors = [(1, 0.6, 0.1), (0.1, 0.6, 1), (1, 0.2, 0.4), (0.2, 1, 0.4),
+                  (0.7, 0.2, 1), (1, 0.4, 0.05), (0.05, 0.8, 0.8), (1, 0.1, 0.5)]
+    orb_idx = np.arange(len(orb_colors))
+    orb_angles = orb_idx * golden_angle * 30
+    orb_r = 0.15 * np.sqrt(orb_idx * 35)
+    orb_xy = np.stack([orb_r * np.cos(orb_angles), orb_r * np.sin(orb_angles)], axis=1)
+    # All orbs share one small sphere mesh; each gets its own emission material
+    # through an object-linked slot
+    orb_mesh = make_uv_sphere_mesh("Orb", segments=32, rings=16)
+    orb_mesh.materials.append(None)
+    for i, (x, y) in enumerate(orb_xy.tolist()):
+        orb = add_object(f"Orb{i}", orb_mesh, (x, y, 0.15))
+        orb.scale = (0.03, 0.03, 0.03)
+        orb.material_slots[0].link = 'OBJECT'
+        orb.material_slots[0].material = make_emission(f"Orb{i}", orb_colors[i], 15)
+
+    # Ground plane
+    ground = add_object("Ground", make_plane_mesh("Ground", 20))
+    ground.data.materials.append(
+        make_principled("Ground", (0.02, 0.02, 0.025), metallic=1.0, roughness=0.05)
+    )
 
-golden_angle = math.pi * (3 - math.sqrt(5))  # ~137.5 degrees
+    # Lighting — dramatic three-point setup
+    key = add_light("Key", 'AREA', (4, -3, 5), 1200, (1.0, 0.9, 0.75))
+    key.data.size = 2.0
+
+    fill = add_light("Fill", 'AREA', (-3, 4, 3), 350, (0.3, 0.4, 1.0))
+    fill.data.size = 1.8
+
+    rim = add_light("Rim", 'AREA', (0, -4, 1.5), 450, (1.0, 0.5, 0.15))
+    rim.data.size = 1.2
+
+    # Camera — looking down at an angle
+    cam = add_object("Camera", bpy.data.cameras.new("Camera"), (3.5, -3.5, 3.2))
+    bpy.context.scene.camera = cam
+
+    # Track to center
+    target = add_object("SpiralTarget", None, (0, 0, 0.3))
+    constraint = cam.constraints.new('TRACK_TO')
+    constraint.target = target
+    constraint.track_axis = 'TRACK_NEGATIVE_Z'
+    constraint.up_axis = 'UP_Y'
+
+    # DOF
+    cam.data.dof.use_dof = True
+    cam.data.dof.focus_object = target
+    cam.data.dof.aperture_fstop = 2.8
+    cam.data.lens = 50
+
+    # World — pure black, no volumetrics (clean black background)
+    world = bpy.data.worlds.new("SpiralWorld")
+    bpy.context.scene.world = world
+    world.use_nodes = True
+    nodes = world.node_tree.nodes
+    links = world.node_tree.links
+    nodes.clear()
+    out = nodes.new('ShaderNodeOutputWorld')
+    bg = nodes.new('ShaderNodeBackground')
+    bg.inputs['Color'].default_value = (0.0, 0.0, 0.0, 1)
+    bg.inputs['Strength'].default_value = 0.0
+    links.new(bg.outputs[0], out.inputs['Surface'])
 
-# Materials
-mat_gold = make_principled("Gold", (0.95, 0.75, 0.15), metallic=1.0, roughness=0.08)
-mat_copper = make_principled("Copper", (0.85, 0.45, 0.2), metallic=1.0, roughness=0.12)
-mat_bronze = make_principled("Bronze", (0.7, 0.45, 0.2), metallic=1.0, roughness=0.15)
-mat_jade = make_principled("Jade", (0.15, 0.6, 0.3), metallic=0.0, roughness=0.2,
-                            subsurface=0.6, ss_radius=(0.1, 0.8, 0.2))
-mat_rosegold = make_principled("RoseGold", (0.85, 0.5, 0.45), metallic=1.0, roughness=0.1)
-materials = [mat_gold, mat_copper, mat_bronze, mat_jade, mat_rosegold]
+    # Evaluate the finished scene once
+    bpy.context.view_layer.update()
 
-# Create spiral of spheres
-n_spheres = 300
-objects = []
-for i in range(n_spheres):
-    theta = i * golden_angle
-    r = 0.15 * math.sqrt(i)
-    x = r * math.cos(theta)
-    y = r * math.sin(theta)
 
-    # Size varies — larger in center, smaller outward
-    sphere_size = 0.08 + 0.06 * (1 - i / n_spheres)
-    z = sphere_size  # sit on ground plane
+def render():
+    """Apply render settings, render to OUTPUT and report timing."""
+    scene = bpy.context.scene
+    configure_render(scene, samples=384, adaptive_min_samples=32)
+    scene.cycles.max_bounces = 12
+
+    render_still(scene, OUTPUT, "1280x720 @ 384 samples")
 
-    bpy.ops.mesh.primitive_uv_sphere_add(
-        radius=sphere_size, segments=24, ring_count=16, location=(x, y, z)
-    )
-    obj = bpy.context.active_object
-    obj.data.materials.append(materials[i % len(materials)])
-
-    # Smooth shading
-    bpy.ops.object.shade_smooth()
-    objects.append(obj)
-
-print(f"Created {len(objects)} spheres in {time.time()-t0:.1f}s")
-
-# Small emissive accents tucked among the spheres (not floating white blobs)
-for i in range(8):
-    angle = i * golden_angle * 30
-    r = 0.15 * math.sqrt(i * 35)
-    x = r * math.cos(angle)
-    y = r * math.sin(angle)
-    bpy.ops.mesh.primitive_uv_sphere_add(radius=0.03, location=(x, y, 0.15))
-    orb = bpy.context.active_object
-    colors = [(1, 0.6, 0.1), (0.1, 0.6, 1), (1, 0.2, 0.4), (0.2, 1, 0.4),
-              (0.7, 0.2, 1), (1, 0.4, 0.05), (0.05, 0.8, 0.8), (1, 0.1, 0.5)]
-    orb.data.materials.append(make_emission(f"Orb{i}", colors[i], 15))
-    bpy.ops.object.shade_smooth()
-
-# Ground plane
-bpy.ops.mesh.primitive_plane_add(size=20, location=(0, 0, 0))
-ground = bpy.context.active_object
-ground.data.materials.append(
-    make_principled("Ground", (0.02, 0.02, 0.025), metallic=1.0, roughness=0.05)
-)
 
-# Lighting — dramatic three-point setup
-bpy.ops.object.light_add(type='AREA', location=(4, -3, 5))
-key = bpy.context.active_object
-key.data.energy = 1200
-key.data.color = (1.0, 0.9, 0.75)
-key.data.size = 2.0
-
-bpy.ops.object.light_add(type='AREA', location=(-3, 4, 3))
-fill = bpy.context.active_object
-fill.data.energy = 350
-fill.data.color = (0.3, 0.4, 1.0)
-fill.data.size = 1.8
-
-bpy.ops.object.light_add(type='AREA', location=(0, -4, 1.5))
-rim = bpy.context.active_object
-rim.data.energy = 450
-rim.data.color = (1.0, 0.5, 0.15)
-rim.data.size = 1.2
-
-# Camera — looking down at an angle
-bpy.ops.object.camera_add(location=(3.5, -3.5, 3.2))
-cam = bpy.context.active_object
-bpy.context.scene.camera = cam
-
-# Track to center
-bpy.ops.object.empty_add(location=(0, 0, 0.3))
-target = bpy.context.active_object
-target.name = "SpiralTarget"
-constraint = cam.constraints.new('TRACK_TO')
-constraint.target = target
-constraint.track_axis = 'TRACK_NEGATIVE_Z'
-constraint.up_axis = 'UP_Y'
-
-# DOF
-cam.data.dof.use_dof = True
-cam.data.dof.focus_object = target
-cam.data.dof.aperture_fstop = 2.8
-cam.data.lens = 50
-
-# World — pure black, no volumetrics (clean black background)
-world = bpy.data.worlds.new("SpiralWorld")
-bpy.context.scene.world = world
-world.use_nodes = True
-nodes = world.node_tree.nodes
-links = world.node_tree.links
-nodes.clear()
-out = nodes.new('ShaderNodeOutputWorld')
-bg = nodes.new('ShaderNodeBackground')
-bg.inputs['Color'].default_value = (0.0, 0.0, 0.0, 1)
-bg.inputs['Strength'].default_value = 0.0
-links.new(bg.outputs[0], out.inputs['Surface'])
-
-# Render
-scene = bpy.context.scene
-scene.render.engine = 'CYCLES'
-scene.cycles.device = 'GPU'
-scene.cycles.samples = 384
-scene.cycles.use_denoising = True
-scene.cycles.max_bounces = 12
-scene.render.resolution_x = 1280
-scene.render.resolution_y = 720
-scene.render.resolution_percentage = 100
-scene.render.film_transparent = False
-scene.render.image_settings.file_format = 'PNG'
-scene.render.image_settings.color_depth = '16'
-
-prefs = bpy.context.preferences.addons['cycles'].preferences
-prefs.compute_device_type = 'CUDA'
-prefs.get_devices()
-for d in prefs.devices:
-    d.use = True
-
-scene.render.filepath = OUTPUT
-
-print(f"Rendering 1280x720 @ 384 samples...")
-t_render = time.time()
-bpy.ops.render.render(write_still=True)
-t_render = time.time() - t_render
-
-print(f"Done in {t_render:.1f}s ({os.path.getsize(OUTPUT):,} bytes)")
-print(f"Output: {OUTPUT}")
+if __name__ == "__main__":
+    build_scene()
+    render()